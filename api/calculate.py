@@ -5,63 +5,119 @@ POST /api/calculate
   - returns JSON: { summary, total_receivable, total_income, contract_count, files:{lease,single,income} }
 """
 from http.server import BaseHTTPRequestHandler
-import cgi
+from urllib.parse import urlsplit, parse_qs
 import json
 import os
 import sys
 import uuid
 import base64
 import shutil
+import time
 import traceback
 import tempfile
 
-# Add lib/ to path so we can import lease_calculator
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
 
+import numpy as np
+import pandas as pd
+import openpyxl  # noqa: F401 - preload the Excel engine during cold start
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import BaseTarget, ValueTarget
+
+# Add lib/ to path so we can import lease_calculator. This runs once at
+# module import: warm serverless pods keep the module alive across
+# invocations, so the heavy pandas/openpyxl import cost is paid only on
+# cold start. There is no input-independent reference data (rate tables,
+# config workbooks) to cache in /tmp — every request parses only its own
+# uploaded workbook.
+_LIB_DIR = os.path.join(os.path.dirname(__file__), '..', 'lib')
+if _LIB_DIR not in sys.path:
+    sys.path.insert(0, _LIB_DIR)
+
+_t0 = time.perf_counter()
 from lease_calculator import LeaseCalculator
+print(f"✓ lease_calculator 导入耗时 {time.perf_counter() - _t0:.3f}s（冷启动一次性开销）")
+
+
+class _SpooledFileTarget(BaseTarget):
+    """Receive the uploaded file part into a spooled temp file
+    (in memory up to 1 MB, spilled to disk beyond that)."""
+
+    def __init__(self):
+        super().__init__()
+        self.file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    def on_data_received(self, chunk: bytes):
+        self.file.write(chunk)
+
+
+# Chunk size for streaming base64: a multiple of 3 so every chunk encodes
+# without padding and the concatenation equals a whole-file encode
+_B64_CHUNK = 3 * 256 * 1024
+
+
+def _dumps(data: dict) -> bytes:
+    """Serialize to UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        # Single C-level walk straight to bytes; numpy scalars from
+        # pandas serialize without .item() conversion
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
 
+# Output filename suffixes per file kind; str.endswith with a tuple
+# dispatches to a single C loop over the alternatives
+# Reject uploads larger than this before reading any of the body
+_MAX_UPLOAD = 25 * 1024 * 1024
 
-def _read_b64(path: str) -> str:
-    """Read a file and return base64-encoded string."""
-    with open(path, 'rb') as f:
-        return base64.b64encode(f.read()).decode('utf-8')
+_REQUIRED_FILES = frozenset(('lease', 'single', 'income'))
+
+_XLSX_SUFFIXES = {
+    'lease': ('-lease.xlsx', 'lease.xlsx'),
+    'single': ('-single.xlsx', 'single.xlsx'),
+    'income': ('-income.xlsx', 'income.xlsx'),
+}
 
 
 def _find_output_files(out_dir: str):
     """Find the generated xlsx files in out_dir (timestamped names)."""
     files = {}
-    for fname in os.listdir(out_dir):
-        if fname.endswith('-lease.xlsx') or fname == 'lease.xlsx':
-            files['lease'] = os.path.join(out_dir, fname)
-        elif fname.endswith('-single.xlsx') or fname == 'single.xlsx':
-            files['single'] = os.path.join(out_dir, fname)
-        elif fname.endswith('-income.xlsx') or fname == 'income.xlsx':
-            files['income'] = os.path.join(out_dir, fname)
-    # Also check for files matching pattern YYYYMMDDHHMMSS-xxx.xlsx
-    for fname in os.listdir(out_dir):
-        if fname.endswith('.xlsx'):
-            lower = fname.lower()
-            if 'lease' in lower and 'lease' not in files:
-                files['lease'] = os.path.join(out_dir, fname)
-            elif 'single' in lower and 'single' not in files:
-                files['single'] = os.path.join(out_dir, fname)
-            elif 'income' in lower and 'income' not in files:
-                files['income'] = os.path.join(out_dir, fname)
+    with os.scandir(out_dir) as it:
+        for entry in it:
+            if len(files) == len(_XLSX_SUFFIXES):
+                break  # all kinds found; skip the rest of the directory
+            name = entry.name
+            if not entry.is_file():
+                continue
+            for key, suffixes in _XLSX_SUFFIXES.items():
+                if name.endswith(suffixes):
+                    files.setdefault(key, os.path.join(out_dir, name))
+                    break
     return files
 
 
 class handler(BaseHTTPRequestHandler):
 
+    # Chunked transfer encoding requires HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
     def log_message(self, format, *args):
         """Suppress default request logging."""
         pass
 
     def _send_json(self, status: int, data: dict):
-        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        body = _dumps(data)
         self.send_response(status)
         self.send_header('Content-Type', 'application/json; charset=utf-8')
         self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
+        if self.close_connection:
+            # Error paths that answer before draining the body must tell
+            # the client not to reuse this connection
+            self.send_header('Connection', 'close')
         self.end_headers()
         self.wfile.write(body)
 
@@ -72,55 +128,142 @@ class handler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
 
+    def _write_chunk(self, data: bytes):
+        """Write one HTTP/1.1 chunked-transfer frame."""
+        if data:
+            self.wfile.write(b'%X\r\n' % len(data) + data + b'\r\n')
+
+    def _send_json_streamed(self, status: int, envelope: dict, file_paths: dict):
+        """Send JSON with Transfer-Encoding: chunked, appending a "files"
+        object whose base64 values are generated chunk-by-chunk from disk —
+        the full response body never exists in memory."""
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        head = _dumps(envelope)
+        # Reopen the envelope object to splice in the files
+        self._write_chunk(head[:-1] + b',"files":{')
+        for i, (key, path) in enumerate(file_paths.items()):
+            sep = b',' if i else b''
+            self._write_chunk(sep + b'"%s":"' % key.encode('ascii'))
+            with open(path, 'rb') as f:
+                while chunk := f.read(_B64_CHUNK):
+                    self._write_chunk(base64.b64encode(chunk))
+            self._write_chunk(b'"')
+        self._write_chunk(b'}}')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _send_xlsx(self, path: str):
+        """Stream an xlsx file as binary, avoiding the base64 round-trip."""
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.send_header('Content-Length', str(size))
+        self.send_header('Content-Disposition',
+                         f'attachment; filename="{os.path.basename(path)}"')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.flush()
+        with open(path, 'rb') as src:
+            try:
+                # Zero-copy: kernel moves file pages straight to the socket
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(self.wfile.fileno(), src.fileno(),
+                                       offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except (OSError, AttributeError):
+                # Platforms/sockets without sendfile support. Resume from
+                # offset: sendfile may have sent part of the file before
+                # failing, and the Content-Length framing means any resent
+                # bytes would corrupt the download. offset is 0 when
+                # sendfile was unavailable from the start.
+                src.seek(offset)
+                shutil.copyfileobj(src, self.wfile)
+
     def do_POST(self):
         tmp_dir = None
         try:
+            # Optional binary response: ?download=lease|single|income streams
+            # that xlsx directly instead of base64-embedding all three in JSON
+            query = parse_qs(urlsplit(self.path).query)
+            download = query.get('download', [None])[0]
+            if download is not None and download not in ('lease', 'single', 'income'):
+                # Responding before the body is read would leave it in the
+                # socket and poison a reused keep-alive connection
+                self.close_connection = True
+                self._send_json(400, {'error': 'download 参数必须是 lease/single/income 之一'})
+                return
+
             # Parse multipart/form-data
             content_type = self.headers.get('Content-Type', '')
             if 'multipart/form-data' not in content_type:
+                self.close_connection = True
                 self._send_json(400, {'error': '请求必须是 multipart/form-data 格式'})
                 return
 
-            environ = {
-                'REQUEST_METHOD': 'POST',
-                'CONTENT_TYPE': content_type,
-                'CONTENT_LENGTH': self.headers.get('Content-Length', '0'),
-            }
-            form = cgi.FieldStorage(
-                fp=self.rfile,
-                headers=self.headers,
-                environ=environ,
-            )
-
-            # Extract file
-            if 'file' not in form:
-                self._send_json(400, {'error': '缺少文件字段 "file"'})
+            # Cap worst-case work before touching the body
+            content_length = int(self.headers.get('Content-Length', '0') or 0)
+            if content_length > _MAX_UPLOAD:
+                # Rejecting without reading means the oversized body is
+                # still in flight — never let this connection be reused
+                self.close_connection = True
+                self._send_json(413, {
+                    'error': f'上传文件过大（上限 {_MAX_UPLOAD // (1024 * 1024)} MB）'
+                })
                 return
 
-            file_item = form['file']
-            file_data = file_item.file.read()
-            if not file_data:
-                self._send_json(400, {'error': '上传的文件为空'})
+            # Stream-parse the multipart body in 1 MB chunks; the C-level
+            # parser writes the file part into a spooled temp file as it
+            # arrives, so the body is never scanned or buffered in Python
+            parser = StreamingFormDataParser(headers={'Content-Type': content_type})
+            file_target = _SpooledFileTarget()
+            start_target = ValueTarget()
+            end_target = ValueTarget()
+            parser.register('file', file_target)
+            parser.register('start', start_target)
+            parser.register('end', end_target)
+
+            remaining = content_length
+            while remaining > 0:
+                chunk = self.rfile.read(min(1024 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                parser.data_received(chunk)
+
+            if file_target.multipart_filename is None:
+                self._send_json(400, {'error': '缺少文件字段 "file"'})
                 return
 
             # Extract dates
-            start_val = form.getvalue('start', '')
-            end_val = form.getvalue('end', '')
+            start_val = start_target.value.decode('utf-8')
+            end_val = end_target.value.decode('utf-8')
             if not start_val or not end_val:
                 self._send_json(400, {'error': '缺少 start 或 end 参数（格式 YYYY-MM-DD）'})
                 return
 
-            # Write input file to /tmp
+            # Feed the spooled upload straight into the calculator —
+            # no /tmp/input.xlsx hop
+            upload = file_target.file
+            upload.seek(0, os.SEEK_END)
+            if upload.tell() == 0:
+                self._send_json(400, {'error': '上传的文件为空'})
+                return
+            upload.seek(0)
+
             tmp_dir = tempfile.mkdtemp(prefix='lease_', dir='/tmp')
-            input_path = os.path.join(tmp_dir, 'input.xlsx')
             out_dir = os.path.join(tmp_dir, 'output')
             os.makedirs(out_dir, exist_ok=True)
 
-            with open(input_path, 'wb') as f:
-                f.write(file_data)
-
             # Run calculation
-            calc = LeaseCalculator(input_path)
+            calc = LeaseCalculator(upload)
             result_dfs = calc.process_all_contracts(
                 start_month=start_val,
                 end_month=end_val,
@@ -132,57 +275,80 @@ class handler(BaseHTTPRequestHandler):
             # Find output files
             output_files = _find_output_files(out_dir)
 
-            missing = [k for k in ('lease', 'single', 'income') if k not in output_files]
+            missing = _REQUIRED_FILES - output_files.keys()
             if missing:
                 self._send_json(500, {
-                    'error': f'计算完成但未找到输出文件: {missing}。out_dir 内容: {os.listdir(out_dir)}'
+                    'error': f'计算完成但未找到输出文件: {sorted(missing)}。out_dir 内容: {os.listdir(out_dir)}'
                 })
                 return
 
+            # Binary path: stream the requested file, no JSON/base64 envelope
+            if download is not None:
+                self._send_xlsx(output_files[download])
+                return
+
             # Build summary from results
             # process_all_contracts returns (summary_df, monthly_receivables_df, monthly_income_df)
+            # Vectorized: column-level reductions instead of iterrows (slow path)
             summary = []
             total_receivable = 0.0
             total_income = 0.0
 
             summary_df = result_dfs[0] if result_dfs else None
             if summary_df is not None and len(summary_df) > 0:
-                for _, row in summary_df.iterrows():
-                    recv = float(row.get('应收总额', 0) or 0)
-                    inc = float(row.get('收入总额', 0) or 0)
-                    bank = float(row.get('银行对账单', 0) or 0)
-                    inv = float(row.get('发票对账', 0) or 0)
-                    total_receivable += recv
-                    total_income += inc
-                    summary.append({
-                        'customer': str(row.get('客户名称', '')),
-                        'merchant_id': str(row.get('商户编号', '')),
-                        'receivable': round(recv, 2),
-                        'income': round(inc, 2),
-                        'bank_matched': round(bank, 2),
-                        'invoice_matched': round(inv, 2),
-                        'notes': str(row.get('数据备注', '') or ''),
-                    })
-
-            response = {
+                # One ndarray conversion, then C-level reductions/rounding
+                arr = summary_df.reindex(
+                    columns=['应收总额', '收入总额', '银行对账单', '发票对账']
+                ).to_numpy(dtype='float64', na_value=0.0)
+                totals = arr.sum(axis=0)
+                total_receivable = float(totals[0])
+                total_income = float(totals[1])
+                rounded = np.round(arr, 2)
+                # One string-dtype cast per column; tolist() then yields
+                # plain str without per-cell coercion
+                customers = summary_df['客户名称'].astype('string').fillna('').tolist()
+                merchant_ids = summary_df['商户编号'].astype('string').fillna('').tolist()
+                notes = summary_df['数据备注'].astype('string').fillna('').tolist()
+                summary = [
+                    {
+                        'customer': cust,
+                        'merchant_id': mid,
+                        'receivable': row[0],
+                        'income': row[1],
+                        'bank_matched': row[2],
+                        'invoice_matched': row[3],
+                        'notes': note,
+                    }
+                    for cust, mid, note, row in zip(
+                        customers, merchant_ids, notes, rounded.tolist()
+                    )
+                ]
+
+            envelope = {
                 'contract_count': len(summary),
                 'total_receivable': round(total_receivable, 2),
                 'total_income': round(total_income, 2),
                 'summary': summary,
-                'files': {
-                    'lease': _read_b64(output_files['lease']),
-                    'single': _read_b64(output_files['single']),
-                    'income': _read_b64(output_files['income']),
-                },
             }
 
-            self._send_json(200, response)
+            # Stream the response; the base64 of the three files is
+            # produced and sent chunk-by-chunk instead of being built
+            # into one multi-MB JSON string
+            self._send_json_streamed(200, envelope, {
+                k: output_files[k] for k in ('lease', 'single', 'income')
+            })
 
         except Exception as e:
-            tb = traceback.format_exc()
+            # Log the traceback server-side only; the response carries a
+            # short id to correlate with the Vercel logs
+            err_id = uuid.uuid4().hex[:8]
+            sys.stderr.write(f'[{err_id}] {traceback.format_exc()}')
+            # The failure may have struck mid-body-read; don't let the
+            # client reuse a connection with unread bytes in flight
+            self.close_connection = True
             self._send_json(500, {
                 'error': f'计算失败: {str(e)}',
-                'traceback': tb,
+                'error_id': err_id,
             })
         finally:
             # Clean up temp files
@@ -11,24 +11,349 @@
 4. 在Excel输出中附加辅助列（中间值和计算公式），用于排错
 """
 
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-import calendar
-import math
+from itertools import repeat
+import io
 import sys
 from pathlib import Path
 
+try:
+    from pyexcelerate import Workbook as _PEWorkbook
+    from pyexcelerate import Style as _PEStyle, Format as _PEFormat
+except ImportError:  # 缺席时退回pandas默认的openpyxl写出
+    _PEWorkbook = None
+
+try:
+    import python_calamine  # noqa: F401
+    _EXCEL_ENGINE = 'calamine'  # Rust解析器，读xlsx比openpyxl快数倍
+except ImportError:  # 缺席时退回openpyxl（写出始终用openpyxl）
+    _EXCEL_ENGINE = 'openpyxl'
+
+try:
+    from numba import njit
+except ImportError:  # numba是可选加速依赖，缺席时退回纯Python实现
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        if args and callable(args[0]):
+            return args[0]
+        return wrap
+
+
+# 每月天数表（平年）；numba会把模块级ndarray当作编译期常量
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31],
+                          dtype=np.int64)
+
+
+@njit(cache=True)
+def _month_length(year, month):
+    """某年某月的天数（含闰年判断）"""
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DAYS_IN_MONTH[month - 1]
+
+
+@njit(cache=True)
+def _ymd_to_ord(year, month, day):
+    """公历(年,月,日) -> 与date.toordinal()一致的序数日"""
+    y = year - 1 if month <= 2 else year
+    era = y // 400 if y >= 0 else (y - 399) // 400
+    yoe = y - era * 400
+    mp = month - 3 if month > 2 else month + 9
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468 + 719163
+
+
+@njit(cache=True)
+def _add_months_ord(year, month, day, months):
+    """加若干个月后的序数日（日超出月末时截断，对齐relativedelta行为）"""
+    m = month - 1 + months
+    y = year + m // 12
+    m = m % 12 + 1
+    md = _month_length(y, m)
+    d = day if day <= md else md
+    return _ymd_to_ord(y, m, d)
+
+
+@njit(cache=True)
+def _calc_monthly_rent_core(delivery_year, delivery_month, delivery_day,
+                            delivery_ord, lease_end_ord, free_days,
+                            rent_years, target_month_offset):
+    """月租金核心计算——纯整数日期算术，无pandas/dateutil对象
+
+    与calculate_monthly_rent的详细路径逐月等价；参数为序数日和
+    float64租金数组，以便numba JIT编译
+    """
+    # 目标月起止（日恒为1，直接用整数月算术）
+    tm = delivery_month - 1 + target_month_offset
+    target_year = delivery_year + tm // 12
+    target_month = tm % 12 + 1
+    month_days = _month_length(target_year, target_month)
+    month_start_ord = _ymd_to_ord(target_year, target_month, 1)
+    month_end_ord = month_start_ord + month_days - 1
+
+    # 本月免租天数
+    free_end_ord = delivery_ord + free_days - 1
+    free_start = max(delivery_ord, month_start_ord)
+    free_end = min(free_end_ord, month_end_ord)
+    n_free = free_end - free_start + 1 if free_start <= free_end else 0
+
+    # 本月有效天数（租赁期内）
+    eff_start = max(delivery_ord, month_start_ord)
+    eff_end = min(lease_end_ord, month_end_ord)
+    if eff_start > eff_end:
+        return 0.0  # 不在租赁期内
+
+    n_eff = eff_end - eff_start + 1
+    n_pay_total = n_eff - n_free
+    if n_pay_total <= 0:
+        return 0.0
+
+    n_years = len(rent_years)
+
+    # 检查是否跨年度（除最后一年外的各年度结束日是否落在本月内）
+    split_year = 0
+    split_ord = 0
+    for i in range(1, n_years):
+        year_end_ord = _add_months_ord(delivery_year, delivery_month,
+                                       delivery_day, 12 * i) - 1
+        if month_start_ord <= year_end_ord <= month_end_ord:
+            split_year = i
+            split_ord = year_end_ord
+            break
+
+    if split_year == 0:
+        # 不跨年度：整月属于同一租赁年
+        months_diff = (target_year - delivery_year) * 12 + \
+                      (target_month - delivery_month)
+        if delivery_day > 1:  # 目标月日恒为1
+            months_diff -= 1
+
+        year_num = int(months_diff / 12) + 1
+        if year_num > n_years:
+            year_num = n_years
+        rent_y = rent_years[year_num - 1]
+
+        if rent_y != rent_y or rent_y == 0:  # NaN或未设置
+            return 0.0
+        return rent_y / month_days * n_pay_total
+
+    # 跨年度：拆分两部分计算
+    n1_days = split_ord - month_start_ord + 1
+    rent_y1 = rent_years[split_year - 1]
+    if rent_y1 != rent_y1:
+        rent_y1 = 0.0
+
+    n2_days = month_end_ord - split_ord
+    rent_y2 = rent_years[split_year] if split_year < n_years else 0.0
+    if rent_y2 != rent_y2:
+        rent_y2 = 0.0
+
+    return rent_y1 / month_days * n1_days + rent_y2 / month_days * n2_days
+
+
+@njit(cache=True)
+def _ord_to_ym(ordinal):
+    """序数日 -> (年,月)，_ymd_to_ord的逆运算"""
+    z = ordinal - 719163 + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    y = yoe + era * 400
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    m = mp + 3 if mp < 10 else mp - 9
+    if m <= 2:
+        y += 1
+    return y, m
+
+
+@njit(cache=True)
+def _calc_period_receivable(delivery_year, delivery_month, delivery_day,
+                            delivery_ord, lease_end_ord, free_days,
+                            rent_years, first_offset, n_months):
+    """一段连续月份的应收合计——闭式跳过"干净"月
+
+    整月在租赁期内、不含免租天数也不跨租赁年的月份，月租金恒等于
+    当年租金（rent_y/月天数×月天数），无需逐月计算：按租赁年分段，
+    每段一次乘法直接累加到下一个边界月。只有交付月、免租期覆盖月、
+    跨年月和届满月退回_calc_monthly_rent_core逐月精算。
+    注意：浮点乘加顺序不同，结果与逐月求和只在舍入误差内一致，
+    个别合同在半分钱边界上四舍五入后可能差一分钱
+    """
+    total = 0.0
+    n_years = len(rent_years)
+    free_end_ord = delivery_ord + free_days - 1
+    day_shift = 1 if delivery_day > 1 else 0
+
+    # 各租赁年结束日的序数，分段边界扫描共用
+    year_end_ords = np.empty(n_years, dtype=np.int64)
+    for i in range(1, n_years + 1):
+        year_end_ords[i - 1] = _add_months_ord(delivery_year, delivery_month,
+                                               delivery_day, 12 * i) - 1
+
+    o = first_offset
+    end = first_offset + n_months
+    while o < end:
+        tm = delivery_month - 1 + o
+        target_year = delivery_year + tm // 12
+        target_month = tm % 12 + 1
+        month_start_ord = _ymd_to_ord(target_year, target_month, 1)
+        month_end_ord = month_start_ord + _month_length(target_year, target_month) - 1
+
+        if month_end_ord < delivery_ord:  # 交付前，整月为0
+            o += 1
+            continue
+        if month_start_ord > lease_end_ord:  # 届满后，后续月份全为0
+            break
+
+        if month_start_ord >= delivery_ord and month_start_ord > free_end_ord \
+                and month_end_ord <= lease_end_ord:
+            # 候选干净月：确定所属租赁年和本段的下一个边界
+            year_num = (o - day_shift) // 12 + 1
+            if year_num > n_years:
+                year_num = n_years
+            if year_num < n_years:
+                limit_ord = min(year_end_ords[year_num - 1], lease_end_ord)
+            else:
+                limit_ord = lease_end_ord
+            if limit_ord > month_end_ord:
+                # 边界在本月之后：本月到边界月前一月全是干净月，一次算完
+                by, bm = _ord_to_ym(limit_ord)
+                boundary_offset = (by - delivery_year) * 12 + (bm - delivery_month)
+                run_end = min(boundary_offset - 1, end - 1)
+                rent_y = rent_years[year_num - 1]
+                if rent_y == rent_y:  # NaN贡献为0
+                    total += rent_y * (run_end - o + 1)
+                o = run_end + 1
+                continue
+
+        # 边界月（交付/免租/跨年/届满）逐月精算
+        total += _calc_monthly_rent_core(
+            delivery_year, delivery_month, delivery_day,
+            delivery_ord, lease_end_ord, free_days, rent_years, o)
+        o += 1
+
+    return total
+
+
+def _ymd_to_ord_vec(year, month, day):
+    """_ymd_to_ord的numpy广播版，(年,月,日)数组 -> 序数日数组"""
+    y = np.where(month <= 2, year - 1, year)
+    era = y // 400
+    yoe = y - era * 400
+    mp = np.where(month > 2, month - 3, month + 9)
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468 + 719163
+
+
+def _calc_months_rent_vec(delivery_year, delivery_month, delivery_day,
+                          delivery_ord, lease_end_ord, free_days,
+                          rent_arr, offsets):
+    """一段月份的逐月租金，月份轴整体numpy广播
+
+    与_calc_monthly_rent_core逐月调用严格等值：免租/有效天数用
+    clip算术，跨年月用searchsorted定位年度边界后两段合成。把M次
+    逐月日期算术折叠成一组ufunc调用，无numba的环境收益最大
+    """
+    o = np.asarray(offsets, dtype=np.int64)
+    n_years = len(rent_arr)
+
+    tm = delivery_month - 1 + o
+    target_year = delivery_year + tm // 12
+    target_month = tm % 12 + 1
+    month_days = _DAYS_IN_MONTH[target_month - 1].copy()
+    leap = (target_year % 4 == 0) & ((target_year % 100 != 0) | (target_year % 400 == 0))
+    month_days[(target_month == 2) & leap] = 29
+    month_start = _ymd_to_ord_vec(target_year, target_month, 1)
+    month_end = month_start + month_days - 1
+
+    # 本月免租/有效/应付天数
+    free_end_ord = delivery_ord + free_days - 1
+    n_free = np.clip(np.minimum(free_end_ord, month_end) -
+                     np.maximum(delivery_ord, month_start) + 1, 0, None)
+    n_eff = np.minimum(lease_end_ord, month_end) - \
+        np.maximum(delivery_ord, month_start) + 1
+    n_pay = n_eff - n_free
+    payable = (n_eff > 0) & (n_pay > 0)
+
+    # 跨年月：最后一年之外的年度结束日落在本月内
+    boundary_ords = np.array(
+        [_add_months_ord(delivery_year, delivery_month, delivery_day, 12 * i) - 1
+         for i in range(1, n_years)], dtype=np.int64)
+    idx = np.searchsorted(boundary_ords, month_start)
+    safe_idx = np.minimum(idx, max(len(boundary_ords) - 1, 0))
+    split_ord = boundary_ords[safe_idx] if len(boundary_ords) else np.zeros_like(o)
+    is_split = (idx < len(boundary_ords)) & (split_ord <= month_end)
+    split_year = safe_idx + 1  # 边界i对应第i租赁年结束
+
+    rent_safe = np.where(np.isnan(rent_arr), 0.0, rent_arr)
+
+    # 不跨年：整月归属同一租赁年（int()向零截断，与标量核一致）
+    months_diff = o - (1 if delivery_day > 1 else 0)
+    year_num = np.trunc(months_diff / 12).astype(np.int64) + 1
+    year_num = np.minimum(year_num, n_years)
+    plain_rent = rent_safe[np.clip(year_num - 1, 0, n_years - 1)]
+    plain = plain_rent / month_days * n_pay
+
+    # 跨年：两段各按本年租金计（与标量核相同，不再叠加免租/届满修正）
+    rent_y1 = rent_safe[np.clip(split_year - 1, 0, n_years - 1)]
+    rent_y2 = np.where(split_year < n_years,
+                       rent_safe[np.clip(split_year, 0, n_years - 1)], 0.0)
+    n1 = split_ord - month_start + 1
+    n2 = month_end - split_ord
+    split_val = rent_y1 / month_days * n1 + rent_y2 / month_days * n2
+
+    return np.where(payable, np.where(is_split, split_val, plain), 0.0)
+
+
+def _write_parquet(df, path):
+    """DataFrame保存为Parquet（列式二进制，供程序消费，需要pyarrow）"""
+    df.to_parquet(path, engine='pyarrow', compression='zstd', index=False)
+
+
+def _write_xlsx(df, path):
+    """DataFrame保存为无格式xlsx
+
+    报表输出没有任何样式，优先走pyexcelerate的流式序列化
+    （免去openpyxl逐格建对象的开销，千行级快数倍），
+    日期列补上显示格式；pyexcelerate缺席时退回to_excel
+    """
+    if _PEWorkbook is None:
+        df.to_excel(path, index=False)
+        return
+
+    # NaN/NaT写成空单元格，与to_excel行为一致
+    clean = df.astype(object).where(df.notna(), None)
+    data = [list(df.columns)]
+    data.extend(clean.itertuples(index=False, name=None))
+
+    wb = _PEWorkbook()
+    ws = wb.new_sheet('Sheet1', data=data)
+    date_style = None
+    for i, dtype in enumerate(df.dtypes, start=1):
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            if date_style is None:
+                date_style = _PEStyle(format=_PEFormat('yyyy-mm-dd'))
+            ws.set_col_style(i, date_style)
+    wb.save(str(path))
+
 
 class LeaseCalculator:
     """租赁合同计算器"""
 
-    def __init__(self, contract_file: str, log_file: str = None):
+    def __init__(self, contract_file, log_file: str = None):
         """
         初始化计算器
 
         Args:
-            contract_file: 合同原始数据Excel文件路径
+            contract_file: 合同原始数据Excel文件路径，或二进制文件对象（如BytesIO）
             log_file: 日志文件路径（可选）
         """
         self.contract_file = contract_file
@@ -37,65 +362,85 @@ class LeaseCalculator:
         self.invoices_df = None
         self.max_lease_years = 6  # 默认值
         self.log_file = log_file
-        self.log_lines = []  # 存储日志行
+        self._log_buf = io.StringIO()  # 单一增长缓冲，免去十万级小字符串列表
+        if log_file is None:
+            # 不写日志时把_log换成无操作桩，热路径上连分支都不剩
+            self._log = self._log_noop
+        # 全合同期应收/天数/日收入率只取决于合同本身，与查询期无关，按合同缓存
+        self._contract_totals_cache = {}
         self._load_data()
         self._detect_max_lease_years()  # 检测最大年度数
+        self._precompute_rent_matrix()
+        self._precompute_validation()
 
     def _load_data(self):
         """加载Excel数据"""
         try:
-            # 读取合同数据
-            self.contracts_df = pd.read_excel(
-                self.contract_file,
-                sheet_name='合同原始数据'
-            )
+            # 工作簿只打开/解压一次，三个Sheet复用同一解析结果
+            if hasattr(self.contract_file, 'seek'):
+                self.contract_file.seek(0)
+            with pd.ExcelFile(self.contract_file, engine=_EXCEL_ENGINE) as xl:
+                # 读取合同数据
+                self.contracts_df = xl.parse('合同原始数据')
 
-            # 读取银行对账单
-            self.bank_statements_df = pd.read_excel(
-                self.contract_file,
-                sheet_name='银行对账单'
-            )
+                # 读取银行对账单
+                self.bank_statements_df = xl.parse('银行对账单')
 
-            # 读取发票信息
-            self.invoices_df = pd.read_excel(
-                self.contract_file,
-                sheet_name='发票信息汇总表'
-            )
+                # 读取发票信息
+                self.invoices_df = xl.parse('发票信息汇总表')
 
             print(f"✓ 成功加载 {len(self.contracts_df)} 个合同")
             print(f"✓ 成功加载 {len(self.bank_statements_df)} 条银行对账单")
             print(f"✓ 成功加载 {len(self.invoices_df)} 条发票记录")
 
+            self._normalize_dtypes()
+            self._prepare_match_columns()
+
         except Exception as e:
             print(f"✗ 加载数据失败: {e}")
             sys.exit(1)
 
     def _detect_max_lease_years(self):
         """检测Excel中最大的租赁年度数"""
-        import re
-        max_year = 1
-        for col in self.contracts_df.columns:
-            match = re.match(r'保底租金第(\d+)年', col)
-            if match:
-                year_num = int(match.group(1))
-                max_year = max(max_year, year_num)
-
-        self.max_lease_years = max_year
+        # 对列名做一次向量化正则提取，替代逐列re.match
+        years = (pd.Series(self.contracts_df.columns)
+                 .str.extract(r'^保底租金第(\d+)年', expand=False)
+                 .dropna().astype(int))
+        self.max_lease_years = max(int(years.max()), 1) if not years.empty else 1
         print(f"✓ 检测到最大租赁年度: {self.max_lease_years}年")
 
     def _log(self, message):
         """写入日志"""
-        self.log_lines.append(message)
+        self._log_buf.write(message)
+        self._log_buf.write('\n')
         if self.log_file:
             print(message)  # 同时打印到控制台
 
+    def _log_noop(self, message):
+        """log_file未设置时的日志桩"""
+        pass
+
     def _save_log(self):
         """保存日志到文件"""
         if self.log_file:
             with open(self.log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(self.log_lines))
+                f.write(self._log_buf.getvalue())
             print(f"\n✓ 计算日志已保存到: {self.log_file}")
 
+    def _precompute_rent_matrix(self):
+        """把各年度保底租金整理成 (合同数, 最大年度数) 的float64矩阵
+
+        列名列表和矩阵只构建一次；缺失的年度列补0，
+        之后按行取租金就是对连续内存的O(1)切片
+        """
+        cols = ['保底租金第1年（必须）'] + \
+               [f'保底租金第{y}年' for y in range(2, self.max_lease_years + 1)]
+        for c in cols[1:]:
+            if c not in self.contracts_df:
+                self.contracts_df[c] = 0.0
+        self._rent_cols = cols
+        self._rent_matrix = self.contracts_df[cols].to_numpy(dtype=np.float64)
+
     def _get_rent_years_list(self, contract_row):
         """从合同行中提取所有年度租金列表
 
@@ -105,46 +450,56 @@ class LeaseCalculator:
         Returns:
             list: 各年度租金列表，如[26496, 27821, ...]
         """
-        rent_years_list = [contract_row['保底租金第1年（必须）']]
+        return [contract_row[c] for c in self._rent_cols]
 
-        for year in range(2, self.max_lease_years + 1):
-            col_name = f'保底租金第{year}年'
-            rent_years_list.append(contract_row.get(col_name, 0))
+    def _precompute_validation(self):
+        """一致性校验的向量化预计算
+
+        实际租期年数用.dt访问器按列算一次（与逐行relativedelta的
+        整年+余数规则等价），已填租金年数直接在租金矩阵上统计，
+        每行校验降为一次布尔掩码读取
+        """
+        start = self.contracts_df['交付日']
+        end_next = self.contracts_df['租期届满日'] + pd.Timedelta(days=1)
 
-        return rent_years_list
+        months_total = ((end_next.dt.year - start.dt.year) * 12 +
+                        (end_next.dt.month - start.dt.month) +
+                        (end_next.dt.day > start.dt.day).astype(int))
+        with np.errstate(invalid='ignore'):
+            actual_years = np.ceil(months_total.to_numpy(dtype=np.float64) / 12)
 
-    def _validate_contract_data(self, contract_row):
+        m = self._rent_matrix
+        filled_years = (~np.isnan(m) & (m != 0)).sum(axis=1)
+
+        has_dates = (start.notna() & self.contracts_df['租期届满日'].notna()).to_numpy()
+        self._validation_actual_years = actual_years
+        self._validation_filled_years = filled_years
+        self._validation_mismatch = has_dates & (actual_years != filled_years)
+
+    def _validate_contract_data(self, contract_row, row_idx):
         """
         校验合同数据一致性：租期届满日与租金年数是否匹配
 
+        重活在_precompute_validation里按列算好，这里只查掩码并拼警告文本
+
         Returns:
             list: 冲突警告字符串列表，空列表表示无冲突
         """
-        warnings = []
-        delivery_date = contract_row.get('交付日')
-        lease_end_date = contract_row.get('租期届满日')
+        if not self._validation_mismatch[row_idx]:
+            return []
+
+        actual_years = int(self._validation_actual_years[row_idx])
+        valid_rent_years = int(self._validation_filled_years[row_idx])
         customer = contract_row.get('客户名称', '')
         merchant_id = contract_row.get('商户编号', '')
+        lease_end_date = contract_row.get('租期届满日')
 
-        if pd.isna(delivery_date) or pd.isna(lease_end_date):
-            return warnings
-
-        delta = relativedelta(pd.to_datetime(lease_end_date) + timedelta(days=1),
-                              pd.to_datetime(delivery_date))
-        actual_years = delta.years + (1 if (delta.months > 0 or delta.days > 0) else 0)
-
-        rent_years_list = self._get_rent_years_list(contract_row)
-        valid_rent_years = sum(1 for r in rent_years_list if not (pd.isna(r) if not isinstance(r, str) else False) and r != 0)
-
-        if valid_rent_years != actual_years:
-            warnings.append(
-                f"[数据冲突] {customer}（{merchant_id}）："
-                f"租期届满日显示租期约 {actual_years} 年，"
-                f"但填写了 {valid_rent_years} 年的租金数据。"
-                f"计算将以租期届满日（{pd.to_datetime(lease_end_date).strftime('%Y-%m-%d')}）为准。"
-            )
-
-        return warnings
+        return [
+            f"[数据冲突] {customer}（{merchant_id}）："
+            f"租期届满日显示租期约 {actual_years} 年，"
+            f"但填写了 {valid_rent_years} 年的租金数据。"
+            f"计算将以租期届满日（{pd.to_datetime(lease_end_date).strftime('%Y-%m-%d')}）为准。"
+        ]
 
     def calculate_monthly_rent(self, delivery_date, lease_end_date, free_days,
                               rent_years_list, target_month_offset, log_detail=False,
@@ -193,6 +548,15 @@ class LeaseCalculator:
         if isinstance(lease_end_date, str):
             lease_end_date = pd.to_datetime(lease_end_date)
 
+        # 快速路径：不需要日志/中间值时走纯整数核心（可JIT编译）
+        if not log_detail and not return_detail:
+            return _calc_monthly_rent_core(
+                delivery_date.year, delivery_date.month, delivery_date.day,
+                delivery_date.toordinal(), lease_end_date.toordinal(),
+                int(free_days), np.asarray(rent_years_list, dtype=np.float64),
+                target_month_offset,
+            )
+
         # 计算目标月份的起止日期
         target_month_start = delivery_date + relativedelta(months=target_month_offset)
         target_month_start = target_month_start.replace(day=1)
@@ -372,7 +736,8 @@ class LeaseCalculator:
                 )
             return total_rent
 
-    def calculate_contract_summary(self, contract_row, start_month, end_month, log_detail=False):
+    def calculate_contract_summary(self, contract_row, start_month, end_month, log_detail=False,
+                                   bank_total=None, invoice_total=None, with_aux=True):
         """
         计算单个合同在指定时间段的汇总数据
 
@@ -381,6 +746,9 @@ class LeaseCalculator:
             start_month: 时间段起始月（格式：'2025-08-01'）
             end_month: 时间段结束月（格式：'2025-12-01'）
             log_detail: 是否记录详细日志
+            bank_total: 预先连接好的银行对账单金额（None时按需匹配）
+            invoice_total: 预先连接好的发票金额（None时按需匹配）
+            with_aux: 是否构造辅助字段（公式字符串等仅排错模式需要）
 
         Returns:
             dict: 包含应收总额、收入总额、银行对账单、发票对账的字典，
@@ -443,26 +811,39 @@ class LeaseCalculator:
         # 提取租金列表（支持动态年度数）
         rent_years_list = self._get_rent_years_list(contract_row)
 
+        # 逐月循环的不变量只计算一次：整数日期参数和float64租金数组
+        delivery_ord = delivery_date.toordinal()
+        lease_end_ord = lease_end_date.toordinal()
+        free_days = int(contract_row['免租期'])
+        rent_arr = np.asarray(rent_years_list, dtype=np.float64)
+
         if log_detail:
             for i, rent in enumerate(rent_years_list, 1):
                 self._log(f"  第{i}年租金: {rent:.2f} 元")
 
-        while current_date <= end_date:
-            # 计算从交付日到当前月的月份偏移
-            months_offset = (current_date.year - delivery_date.year) * 12 + \
-                           (current_date.month - delivery_date.month)
-
-            monthly_rent = self.calculate_monthly_rent(
-                delivery_date,
-                lease_end_date,
-                contract_row['免租期'],
-                rent_years_list,
-                months_offset,
-                log_detail=log_detail
-            )
+        # 查询期覆盖的月份偏移区间——整数月算术，不再逐月relativedelta推进
+        first_offset = (current_date.year - delivery_date.year) * 12 + \
+                       (current_date.month - delivery_date.month)
+        n_query_months = (end_date.year - current_date.year) * 12 + \
+                         (end_date.month - current_date.month) + 1
 
-            total_receivable += monthly_rent
-            current_date += relativedelta(months=1)
+        if log_detail:
+            for months_offset in range(first_offset, first_offset + n_query_months):
+                total_receivable += self.calculate_monthly_rent(
+                    delivery_date,
+                    lease_end_date,
+                    free_days,
+                    rent_years_list,
+                    months_offset,
+                    log_detail=True
+                )
+        else:
+            # 闭式分段求和：干净月按租赁年一次算完，只精算边界月
+            total_receivable = _calc_period_receivable(
+                delivery_date.year, delivery_date.month, delivery_date.day,
+                delivery_ord, lease_end_ord, free_days, rent_arr,
+                first_offset, n_query_months,
+            )
 
         if log_detail:
             self._log(f"\n  应收总额合计: {total_receivable:.2f} 元")
@@ -473,28 +854,32 @@ class LeaseCalculator:
             self._log(f"  公式: 收入总额 = 合同总应收 / 合同总天数 × 查询期天数")
             self._log(f"  基于日收入率，平滑分摊到合同期内每一天")
 
-        # 1. 计算合同内总时间的应收总额
-        total_contract_receivable = 0
-        for month_offset in range(total_months):
-            monthly_rent = self.calculate_monthly_rent(
-                delivery_date,
-                lease_end_date,
-                contract_row['免租期'],
-                rent_years_list,
-                month_offset,
-                log_detail=False  # 不记录详细日志
+        # 1-3. 全合同期应收总额、总天数、日收入率——与查询期无关，按合同缓存
+        cache_key = (delivery_ord, lease_end_ord, free_days, rent_arr.tobytes())
+        cached = self._contract_totals_cache.get(cache_key)
+        if cached is not None:
+            total_contract_receivable, total_contract_days, daily_income_rate = cached
+        else:
+            # 计算合同内总时间的应收总额（复用上面预计算的不变量）
+            total_contract_receivable = _calc_period_receivable(
+                delivery_date.year, delivery_date.month, delivery_date.day,
+                delivery_ord, lease_end_ord, free_days, rent_arr,
+                0, total_months,
             )
-            total_contract_receivable += monthly_rent
 
-        # 2. 计算合同内的总天数（使用实际租期届满日）
-        lease_end = lease_end_date
-        total_contract_days = (lease_end - delivery_date).days + 1
+            # 计算合同内的总天数（使用实际租期届满日）
+            total_contract_days = lease_end_ord - delivery_ord + 1
 
-        # 3. 计算收入日租金
-        if total_contract_days > 0:
-            daily_income_rate = total_contract_receivable / total_contract_days
-        else:
-            daily_income_rate = 0
+            # 计算收入日租金
+            if total_contract_days > 0:
+                daily_income_rate = total_contract_receivable / total_contract_days
+            else:
+                daily_income_rate = 0
+
+            self._contract_totals_cache[cache_key] = (
+                total_contract_receivable, total_contract_days, daily_income_rate)
+
+        lease_end = lease_end_date
 
         if log_detail:
             self._log(f"  合同总应收: {total_contract_receivable:.2f} 元")
@@ -518,84 +903,155 @@ class LeaseCalculator:
             self._log(f"  查询期内天数: {days_in_period} 天")
             self._log(f"  收入总额 = {total_contract_receivable:.2f} / {total_contract_days} × {days_in_period} = {total_income:.2f} 元")
 
-        # 匹配银行对账单
-        bank_total = self._match_bank_statements(customer_name, start_date, end_date)
+        # 匹配银行对账单（未预先连接时按需查询）
+        if bank_total is None:
+            bank_total = self._match_bank_statements(customer_name, start_date, end_date)
 
         # 匹配发票
-        invoice_total = self._match_invoices(customer_name, start_date, end_date)
+        if invoice_total is None:
+            invoice_total = self._match_invoices(customer_name, start_date, end_date)
 
         if log_detail:
             self._log(f"\n【匹配结果】")
             self._log(f"  银行对账单: {bank_total:.2f} 元")
             self._log(f"  发票对账: {invoice_total:.2f} 元")
 
-        income_formula = (
-            f"{total_contract_receivable:.2f} / {total_contract_days}"
-            f" × {days_in_period} = {total_income:.2f}"
-        )
-
-        return {
+        result = {
             '应收总额': round(total_receivable, 2),
             '收入总额': round(total_income, 2),
             '银行对账单': round(bank_total, 2),
             '发票对账': round(invoice_total, 2),
-            # 辅助字段（以 _ 开头，供 process_all_contracts 按需提取）
-            '_合同总天数': total_contract_days,
-            '_合同总应收': round(total_contract_receivable, 2),
-            '_日收入率': round(daily_income_rate, 4),
-            '_查询期天数': days_in_period,
             '_daily_income_rate': daily_income_rate,
-            '_收入计算公式': income_formula,
         }
 
-    def _match_bank_statements(self, customer_name, start_date, end_date):
-        """匹配银行对账单"""
-        try:
-            # 筛选符合条件的记录
-            mask = (
-                (self.bank_statements_df['对方户名'] == customer_name) &
-                (pd.to_datetime(self.bank_statements_df['交易时间']) >= start_date) &
-                (pd.to_datetime(self.bank_statements_df['交易时间']) <= end_date)
+        # 辅助字段（以 _ 开头，供 process_all_contracts 按需提取）；
+        # 公式字符串格式化不便宜，非排错模式直接跳过
+        if with_aux:
+            result['_合同总天数'] = total_contract_days
+            result['_合同总应收'] = round(total_contract_receivable, 2)
+            result['_日收入率'] = round(daily_income_rate, 4)
+            result['_查询期天数'] = days_in_period
+            result['_收入计算公式'] = (
+                f"{total_contract_receivable:.2f} / {total_contract_days}"
+                f" × {days_in_period} = {total_income:.2f}"
             )
 
-            matched = self.bank_statements_df[mask]
-            return matched['贷方发生额（收入）'].sum()
+        return result
+
+    def _normalize_dtypes(self):
+        """合同表日期/金额列的一次性dtype归一
+
+        日期列统一成datetime64，金额列统一成float64，后续所有消费方
+        （序数日转换、租金矩阵、校验）都不再碰到字符串或混合类型。
+        金额保持float64：租金是钱，float32的7位有效数字不够用
+        """
+        for c in ('交付日', '租期届满日'):
+            if c in self.contracts_df:
+                self.contracts_df[c] = pd.to_datetime(
+                    self.contracts_df[c], errors='coerce')
+        if '免租期' in self.contracts_df:
+            self.contracts_df['免租期'] = pd.to_numeric(
+                self.contracts_df['免租期'], errors='coerce').fillna(0).astype(np.int64)
+
+    def _prepare_match_columns(self):
+        """预解析银行/发票的日期列并缓存numpy数组
+
+        日期整列只解析一次，匹配时直接在ndarray上做布尔筛选，
+        避免每个合同都重新解析整列日期（O(合同数×记录数)的解析开销）
+        """
+        try:
+            self.bank_statements_df['交易时间'] = pd.to_datetime(
+                self.bank_statements_df['交易时间'])
+            self._bank_times = self.bank_statements_df['交易时间'].values
+            self._bank_names = self.bank_statements_df['对方户名'].values
+            self._bank_amounts = self.bank_statements_df['贷方发生额（收入）'].values
+        except Exception as e:
+            print(f"警告：银行对账单日期预解析失败 - {e}")
+            self._bank_times = None
+
+        try:
+            self.invoices_df['开票日期'] = pd.to_datetime(
+                self.invoices_df['开票日期'])
+            self._invoice_times = self.invoices_df['开票日期'].values
+            self._invoice_names = self.invoices_df['购买方名称'].values
+            self._invoice_amounts = self.invoices_df['价税合计'].values
+        except Exception as e:
+            print(f"警告：发票日期预解析失败 - {e}")
+            self._invoice_times = None
+
+        # 查询期内按客户预汇总的金额缓存（见 _build_match_lookup）
+        self._match_window = None
+        self._bank_by_customer = {}
+        self._invoice_by_customer = {}
+
+    def _build_match_lookup(self, start_date, end_date):
+        """对查询期内的记录做一次按客户分组汇总
+
+        把逐合同全表扫描（O(合同数×记录数)）换成一次groupby（O(记录数)）
+        加 O(1) 字典查找；同一查询期内的所有合同复用同一份汇总
+        """
+        self._match_window = (start_date, end_date)
+        self._bank_by_customer = {}
+        self._invoice_by_customer = {}
+
+        if self._bank_times is not None:
+            mask = ((self._bank_times >= np.datetime64(start_date)) &
+                    (self._bank_times <= np.datetime64(end_date)))
+            if mask.any():
+                amounts = pd.Series(self._bank_amounts[mask])
+                self._bank_by_customer = amounts.groupby(
+                    self._bank_names[mask]).sum().to_dict()
+
+        if self._invoice_times is not None:
+            mask = ((self._invoice_times >= np.datetime64(start_date)) &
+                    (self._invoice_times <= np.datetime64(end_date)))
+            if mask.any():
+                amounts = pd.Series(self._invoice_amounts[mask])
+                self._invoice_by_customer = amounts.groupby(
+                    self._invoice_names[mask]).sum().to_dict()
+
+    def _match_bank_statements(self, customer_name, start_date, end_date):
+        """匹配银行对账单（按客户预汇总后O(1)查找）"""
+        try:
+            if self._match_window != (start_date, end_date):
+                self._build_match_lookup(start_date, end_date)
+            return self._bank_by_customer.get(customer_name, 0)
         except Exception as e:
             print(f"警告：匹配银行对账单失败 - {e}")
             return 0
 
     def _match_invoices(self, customer_name, start_date, end_date):
-        """匹配发票"""
+        """匹配发票（按客户预汇总后O(1)查找）"""
         try:
-            # 筛选符合条件的记录
-            mask = (
-                (self.invoices_df['购买方名称'] == customer_name) &
-                (pd.to_datetime(self.invoices_df['开票日期']) >= start_date) &
-                (pd.to_datetime(self.invoices_df['开票日期']) <= end_date)
-            )
-
-            matched = self.invoices_df[mask]
-            return matched['价税合计'].sum()
+            if self._match_window != (start_date, end_date):
+                self._build_match_lookup(start_date, end_date)
+            return self._invoice_by_customer.get(customer_name, 0)
         except Exception as e:
             print(f"警告：匹配发票失败 - {e}")
             return 0
 
     def calculate_monthly_breakdown(self, contract_row, start_month, end_month,
-                                    with_aux=False):
+                                    with_aux=False, month_grid=None):
         """
         计算单个合同在时间段内每个月的应收明细
 
         Args:
             with_aux: 是否附加辅助列（中间值和计算公式），用于排错
+            month_grid: 预计算的(月首DatetimeIndex, 标签列表, 月末数组)，
+                        批量处理时各合同共享，None时自行计算
 
         Returns:
-            list: 每个月的应收金额列表，with_aux=True 时附加辅助字段
+            dict: 按列组织的月度数据 {'月份': [...], '应收金额': [...]}，
+                  with_aux=True 时附加辅助列
         """
         delivery_date = contract_row['交付日']
         lease_end_date = contract_row['租期届满日']
 
         if pd.isna(delivery_date):
-            return []
+            return {}
+
+        if isinstance(delivery_date, str):
+            delivery_date = pd.to_datetime(delivery_date)
 
         if isinstance(lease_end_date, str):
             lease_end_date = pd.to_datetime(lease_end_date)
@@ -606,14 +1062,22 @@ class LeaseCalculator:
         # 提取租金列表（支持动态年度数）
         rent_years_list = self._get_rent_years_list(contract_row)
 
-        monthly_list = []
-        current_date = start_date.replace(day=1)
-
-        while current_date <= end_date:
-            months_offset = (current_date.year - delivery_date.year) * 12 + \
-                           (current_date.month - delivery_date.month)
-
-            if with_aux:
+        # 月份起点/标签与合同无关，批量处理时由process_all_contracts
+        # 预先算好一次传入；偏移量依赖交付日，仍按合同计算
+        if month_grid is not None:
+            months, labels, _ = month_grid
+        else:
+            months = pd.date_range(start_date.replace(day=1), end_date, freq='MS')
+            labels = months.strftime('%Y-%m').tolist()
+        offsets = ((months.year - delivery_date.year) * 12 +
+                   (months.month - delivery_date.month))
+
+        if with_aux:
+            # 排错路径：逐月取详细中间值，结果仍按列组织
+            cols = {k: [] for k in ('月份', '应收金额', '免租天数', '有效天数',
+                                    '应付天数', '月天数', '租赁年度', '年租金',
+                                    '日租金', '是否跨年度', '计算公式')}
+            for label, months_offset in zip(labels, offsets):
                 monthly_rent, detail = self.calculate_monthly_rent(
                     delivery_date,
                     lease_end_date,
@@ -634,39 +1098,33 @@ class LeaseCalculator:
                     rent_y_str = f"{detail['rent_y']:.2f}" if detail['rent_y'] is not None else '-'
                     daily_rent_str = f"{detail['daily_rent']:.2f}" if detail['daily_rent'] is not None else '-'
 
-                monthly_list.append({
-                    '月份': current_date.strftime('%Y-%m'),
-                    '应收金额': round(monthly_rent, 2),
-                    '免租天数': detail['n_free'],
-                    '有效天数': detail['n_eff'],
-                    '应付天数': detail['n_pay_total'],
-                    '月天数': detail['month_days'],
-                    '租赁年度': year_num_str,
-                    '年租金': rent_y_str,
-                    '日租金': daily_rent_str,
-                    '是否跨年度': '是' if detail['is_split_year'] else '否',
-                    '计算公式': detail['formula_str'],
-                })
-            else:
-                monthly_rent = self.calculate_monthly_rent(
-                    delivery_date,
-                    lease_end_date,
-                    contract_row['免租期'],
-                    rent_years_list,
-                    months_offset
-                )
-
-                monthly_list.append({
-                    '月份': current_date.strftime('%Y-%m'),
-                    '应收金额': round(monthly_rent, 2)
-                })
-
-            current_date += relativedelta(months=1)
-
-        return monthly_list
+                cols['月份'].append(label)
+                cols['应收金额'].append(round(monthly_rent, 2))
+                cols['免租天数'].append(detail['n_free'])
+                cols['有效天数'].append(detail['n_eff'])
+                cols['应付天数'].append(detail['n_pay_total'])
+                cols['月天数'].append(detail['month_days'])
+                cols['租赁年度'].append(year_num_str)
+                cols['年租金'].append(rent_y_str)
+                cols['日租金'].append(daily_rent_str)
+                cols['是否跨年度'].append('是' if detail['is_split_year'] else '否')
+                cols['计算公式'].append(detail['formula_str'])
+            return cols
+
+        # 月份轴一次广播算完，替代逐月调用标量核；直接产出列，
+        # 不再为每个月造一个中间dict
+        rents = _calc_months_rent_vec(
+            delivery_date.year, delivery_date.month, delivery_date.day,
+            delivery_date.toordinal(), lease_end_date.toordinal(),
+            int(contract_row['免租期']),
+            np.asarray(rent_years_list, dtype=np.float64),
+            offsets.to_numpy(),
+        )
+        return {'月份': labels, '应收金额': np.round(rents, 2)}
 
     def calculate_monthly_income_breakdown(self, contract_row, start_month, end_month,
-                                           daily_income_rate, with_aux=False):
+                                           daily_income_rate, with_aux=False,
+                                           month_grid=None):
         """
         计算单个合同在时间段内每个月的收入明细
 
@@ -676,15 +1134,18 @@ class LeaseCalculator:
             end_month: 时间段结束月
             daily_income_rate: 日收入率
             with_aux: 是否附加辅助列（日收入率、本月合同天数、计算公式）
+            month_grid: 预计算的(月首DatetimeIndex, 标签列表, 月末数组)，
+                        批量处理时各合同共享，None时自行计算
 
         Returns:
-            list: 每个月的收入金额列表
+            dict: 按列组织的月度数据 {'月份': [...], '收入金额': [...]}，
+                  with_aux=True 时附加辅助列
         """
         delivery_date = contract_row['交付日']
         lease_end_date = contract_row['租期届满日']
 
         if pd.isna(delivery_date):
-            return []
+            return {}
 
         # 确保日期格式正确
         if isinstance(delivery_date, str):
@@ -692,50 +1153,69 @@ class LeaseCalculator:
         if isinstance(lease_end_date, str):
             lease_end_date = pd.to_datetime(lease_end_date)
 
-        start_date = pd.to_datetime(start_month)
-        end_date = pd.to_datetime(end_month)
-        end_date = end_date + relativedelta(months=1) - timedelta(days=1)  # 月末
-
-        monthly_list = []
-        current_date = start_date.replace(day=1)
-
-        while current_date <= pd.to_datetime(end_month):
-            # 计算当前月的起止日期
-            month_start = current_date
-            month_end = current_date + relativedelta(months=1) - timedelta(days=1)
-
-            # 计算该月在合同期内的天数
-            period_start = max(month_start, delivery_date)
-            period_end = min(month_end, lease_end_date)
-
-            if period_start <= period_end:
-                days_in_month = (period_end - period_start).days + 1
-                monthly_income = daily_income_rate * days_in_month
-            else:
-                days_in_month = 0
-                monthly_income = 0
+        # 一次性广播计算所有月份的合同内天数，替代逐月relativedelta推进；
+        # 月份网格批量处理时预先算好共享
+        if month_grid is not None:
+            months, labels, month_end_vals = month_grid
+        else:
+            start_date = pd.to_datetime(start_month)
+            months = pd.date_range(start_date.replace(day=1),
+                                   pd.to_datetime(end_month), freq='MS')
+            labels = months.strftime('%Y-%m').tolist()
+            month_end_vals = (months + pd.offsets.MonthEnd(0)).values
+
+        period_starts = np.maximum(months.values, np.datetime64(delivery_date))
+        period_ends = np.minimum(month_end_vals, np.datetime64(lease_end_date))
+        days = ((period_ends - period_starts).astype('timedelta64[D]')
+                .astype(np.int64) + 1)
+        days = np.where(days > 0, days, 0)
+        incomes = daily_income_rate * days
+
+        cols = {
+            '月份': labels,
+            '收入金额': np.round(incomes, 2),
+        }
+        if with_aux:
+            days_list = days.tolist()
+            cols['日收入率'] = [round(daily_income_rate, 4)] * len(days_list)
+            cols['本月合同天数'] = days_list
+            cols['计算公式'] = [
+                f"{daily_income_rate:.4f} × {d} = {inc:.2f}"
+                for d, inc in zip(days_list, incomes.tolist())
+            ]
+        return cols
+
+    def _process_one_contract(self, row, start_month, end_month, aux_columns,
+                              log_detail, bank_total, invoice_total,
+                              month_grid=None):
+        """单个合同的汇总与两类月度明细计算
+
+        不触碰共享可变状态（匹配金额已预先连接好传入），
+        可以安全地在线程池里并行执行
 
-            item = {
-                '月份': current_date.strftime('%Y-%m'),
-                '收入金额': round(monthly_income, 2),
-            }
+        Returns:
+            tuple: (汇总dict, 应收月度明细列dict, 收入月度明细列dict)
+        """
+        summary = self.calculate_contract_summary(
+            row, start_month, end_month, log_detail=log_detail,
+            bank_total=bank_total, invoice_total=invoice_total,
+            with_aux=aux_columns)
 
-            if with_aux:
-                item['日收入率'] = round(daily_income_rate, 4)
-                item['本月合同天数'] = days_in_month
-                item['计算公式'] = (
-                    f"{daily_income_rate:.4f} × {days_in_month} = {monthly_income:.2f}"
-                )
+        monthly_breakdown = self.calculate_monthly_breakdown(
+            row, start_month, end_month, with_aux=aux_columns,
+            month_grid=month_grid)
 
-            monthly_list.append(item)
-            current_date += relativedelta(months=1)
+        monthly_income_breakdown = self.calculate_monthly_income_breakdown(
+            row, start_month, end_month, summary['_daily_income_rate'],
+            with_aux=aux_columns, month_grid=month_grid)
 
-        return monthly_list
+        return summary, monthly_breakdown, monthly_income_breakdown
 
     def process_all_contracts(self, start_month, end_month, output_dir='.',
-                              enable_log=False, aux_columns=False):
+                              enable_log=False, aux_columns=False,
+                              output_format='xlsx'):
         """
-        处理所有合同，生成三个独立的Excel报表
+        处理所有合同，生成三个独立的报表文件
 
         Args:
             start_month: 时间段起始月（格式：'2025-08-01'）
@@ -743,6 +1223,8 @@ class LeaseCalculator:
             output_dir: 输出目录路径（默认为当前目录）
             enable_log: 是否启用详细日志
             aux_columns: 是否在Excel输出中添加辅助列（中间值和计算公式），用于排错
+            output_format: 输出格式，'xlsx'/'parquet'/'both'；parquet写入
+                快一个量级且文件更小，适合下游程序消费（需要pyarrow）
 
         Returns:
             tuple: (汇总DataFrame, 应收明细DataFrame, 收入明细DataFrame)
@@ -757,121 +1239,182 @@ class LeaseCalculator:
             self._log(f"计算时间段: {start_month} 至 {end_month}")
             self._log(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-        summary_results = []
-        monthly_receivables_results = []
-        monthly_income_results = []
+        # 按列累积结果（dict-of-lists），最后一次性构造DataFrame，
+        # 避免先攒一大堆逐行dict再由pandas逐行拆解
+        summary_cols = {
+            '客户名称': [], '商户编号': [], '交付日': [], '租期届满日': [],
+            '免租期': [], '应收总额': [], '收入总额': [], '银行对账单': [],
+            '发票对账': [], '数据备注': [],
+        }
+        recv_cols = {'客户名称': [], '商户编号': [], '月份': [], '应收金额': []}
+        income_cols = {'客户名称': [], '商户编号': [], '月份': [], '收入金额': []}
 
-        for idx, row in self.contracts_df.iterrows():
+        recv_aux_keys = ('免租天数', '有效天数', '应付天数', '月天数', '租赁年度',
+                         '年租金', '日租金', '是否跨年度', '计算公式')
+        income_aux_keys = ('日收入率', '本月合同天数', '计算公式')
+        if aux_columns:
+            summary_cols.update({'合同总天数': [], '合同总应收': [], '日收入率': [],
+                                 '查询期天数': [], '收入计算公式': []})
+            for key in recv_aux_keys:
+                recv_cols[key] = []
+            for key in income_aux_keys:
+                income_cols[key] = []
+
+        # 一次性转成普通dict列表，避免iterrows逐行装箱成Series的开销
+        contract_rows = self.contracts_df.to_dict('records')
+
+        # 一次哈希连接得到与合同行对齐的银行/发票汇总金额
+        query_start = pd.to_datetime(start_month)
+        query_end = pd.to_datetime(end_month) + relativedelta(months=1) - timedelta(days=1)
+        self._build_match_lookup(query_start, query_end)
+
+        # 月份网格（月首/标签/月末）全部合同共用，只算一次
+        grid_months = pd.date_range(query_start.replace(day=1),
+                                    pd.to_datetime(end_month), freq='MS')
+        month_grid = (grid_months,
+                      grid_months.strftime('%Y-%m').tolist(),
+                      (grid_months + pd.offsets.MonthEnd(0)).values)
+
+        names = self.contracts_df['客户名称']
+        bank_totals = names.map(self._bank_by_customer).fillna(0.0).tolist()
+        invoice_totals = names.map(self._invoice_by_customer).fillna(0.0).tolist()
+
+        # 合同间相互独立：不写日志时用线程池并行计算
+        # （numpy部分释放GIL，线程又省掉进程池的序列化开销）
+        results = None
+        if not enable_log and len(contract_rows) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(contract_rows))) as ex:
+                results = list(ex.map(
+                    self._process_one_contract,
+                    contract_rows,
+                    repeat(start_month), repeat(end_month),
+                    repeat(aux_columns), repeat(False),
+                    bank_totals, invoice_totals,
+                    repeat(month_grid),
+                ))
+
+        # 每合同的进度输出先攒到列表，循环后一次写出，
+        # 省去逐行stdout写+刷新的系统调用
+        report = []
+
+        for idx, row in enumerate(contract_rows):
             customer_name = row['客户名称']
             merchant_id = row['商户编号']
 
-            print(f"\n处理合同 {idx+1}/{len(self.contracts_df)}: {customer_name} ({merchant_id})")
+            report.append(f"\n处理合同 {idx+1}/{len(contract_rows)}: {customer_name} ({merchant_id})")
 
             # 校验合同数据一致性
-            validation_warnings = self._validate_contract_data(row)
+            validation_warnings = self._validate_contract_data(row, idx)
             for w in validation_warnings:
-                print(f"  ⚠️  {w}")
+                report.append(f"  ⚠️  {w}")
                 self._log(w)
 
-            # 计算汇总数据（返回值包含辅助字段 _daily_income_rate 等）
-            summary = self.calculate_contract_summary(row, start_month, end_month, log_detail=enable_log)
-
-            # 从 summary 中取出日收入率（避免重复计算）
-            daily_income_rate = summary['_daily_income_rate']
-
-            # 计算应收月度明细
-            monthly_breakdown = self.calculate_monthly_breakdown(
-                row, start_month, end_month, with_aux=aux_columns
-            )
-
-            # 计算收入月度明细
-            monthly_income_breakdown = self.calculate_monthly_income_breakdown(
-                row, start_month, end_month, daily_income_rate, with_aux=aux_columns
-            )
+            # 计算汇总与月度明细（并行模式下直接取已算好的结果）
+            if results is not None:
+                summary, monthly_breakdown, monthly_income_breakdown = results[idx]
+            else:
+                summary, monthly_breakdown, monthly_income_breakdown = \
+                    self._process_one_contract(
+                        row, start_month, end_month, aux_columns, enable_log,
+                        bank_totals[idx], invoice_totals[idx], month_grid,
+                    )
 
             # 汇总数据（用于lease.xlsx）
-            lease_end_date = row['租期届满日']
-            summary_result = {
-                '客户名称': customer_name,
-                '商户编号': merchant_id,
-                '交付日': row['交付日'],
-                '租期届满日': lease_end_date,  # 始终输出
-                '免租期': row['免租期'],
-                '应收总额': summary['应收总额'],
-                '收入总额': summary['收入总额'],
-                '银行对账单': summary['银行对账单'],
-                '发票对账': summary['发票对账'],
-                '数据备注': ' | '.join(validation_warnings) if validation_warnings else ''
-            }
+            summary_cols['客户名称'].append(customer_name)
+            summary_cols['商户编号'].append(merchant_id)
+            summary_cols['交付日'].append(row['交付日'])
+            summary_cols['租期届满日'].append(row['租期届满日'])  # 始终输出
+            summary_cols['免租期'].append(row['免租期'])
+            summary_cols['应收总额'].append(summary['应收总额'])
+            summary_cols['收入总额'].append(summary['收入总额'])
+            summary_cols['银行对账单'].append(summary['银行对账单'])
+            summary_cols['发票对账'].append(summary['发票对账'])
+            summary_cols['数据备注'].append(
+                ' | '.join(validation_warnings) if validation_warnings else '')
 
             # 辅助列（仅 --aux-columns 时添加）
             if aux_columns:
-                summary_result['合同总天数'] = summary['_合同总天数']
-                summary_result['合同总应收'] = summary['_合同总应收']
-                summary_result['日收入率'] = summary['_日收入率']
-                summary_result['查询期天数'] = summary['_查询期天数']
-                summary_result['收入计算公式'] = summary['_收入计算公式']
-
-            summary_results.append(summary_result)
-
-            # 应收月度明细数据（用于single.xlsx）
-            for month_data in monthly_breakdown:
-                monthly_result = {
-                    '客户名称': customer_name,
-                    '商户编号': merchant_id,
-                    '月份': month_data['月份'],
-                    '应收金额': month_data['应收金额'],
-                }
-                if aux_columns:
-                    monthly_result['免租天数'] = month_data.get('免租天数', '')
-                    monthly_result['有效天数'] = month_data.get('有效天数', '')
-                    monthly_result['应付天数'] = month_data.get('应付天数', '')
-                    monthly_result['月天数'] = month_data.get('月天数', '')
-                    monthly_result['租赁年度'] = month_data.get('租赁年度', '')
-                    monthly_result['年租金'] = month_data.get('年租金', '')
-                    monthly_result['日租金'] = month_data.get('日租金', '')
-                    monthly_result['是否跨年度'] = month_data.get('是否跨年度', '')
-                    monthly_result['计算公式'] = month_data.get('计算公式', '')
-                monthly_receivables_results.append(monthly_result)
+                summary_cols['合同总天数'].append(summary['_合同总天数'])
+                summary_cols['合同总应收'].append(summary['_合同总应收'])
+                summary_cols['日收入率'].append(summary['_日收入率'])
+                summary_cols['查询期天数'].append(summary['_查询期天数'])
+                summary_cols['收入计算公式'].append(summary['_收入计算公式'])
+
+            # 应收月度明细数据（用于single.xlsx）——明细已按列组织，整列extend
+            n_months = len(monthly_breakdown.get('月份', ()))
+            recv_cols['客户名称'].extend([customer_name] * n_months)
+            recv_cols['商户编号'].extend([merchant_id] * n_months)
+            for key, values in monthly_breakdown.items():
+                if isinstance(values, np.ndarray):
+                    # 金额数组整段收集，最后一次拼接，元素不装箱
+                    recv_cols[key].append(values)
+                else:
+                    recv_cols[key].extend(values)
 
             # 收入月度明细数据（用于income.xlsx）
-            for month_data in monthly_income_breakdown:
-                monthly_income_result = {
-                    '客户名称': customer_name,
-                    '商户编号': merchant_id,
-                    '月份': month_data['月份'],
-                    '收入金额': month_data['收入金额'],
-                }
-                if aux_columns:
-                    monthly_income_result['日收入率'] = month_data.get('日收入率', '')
-                    monthly_income_result['本月合同天数'] = month_data.get('本月合同天数', '')
-                    monthly_income_result['计算公式'] = month_data.get('计算公式', '')
-                monthly_income_results.append(monthly_income_result)
-
-            print(f"  应收总额: {summary['应收总额']:.2f}")
-            print(f"  收入总额: {summary['收入总额']:.2f}")
-            print(f"  银行对账单: {summary['银行对账单']:.2f}")
-            print(f"  发票对账: {summary['发票对账']:.2f}")
-
-        # 转换为DataFrame
-        summary_df = pd.DataFrame(summary_results)
-        monthly_receivables_df = pd.DataFrame(monthly_receivables_results)
-        monthly_income_df = pd.DataFrame(monthly_income_results)
+            n_months = len(monthly_income_breakdown.get('月份', ()))
+            income_cols['客户名称'].extend([customer_name] * n_months)
+            income_cols['商户编号'].extend([merchant_id] * n_months)
+            for key, values in monthly_income_breakdown.items():
+                if isinstance(values, np.ndarray):
+                    income_cols[key].append(values)
+                else:
+                    income_cols[key].extend(values)
 
-        # 保存到三个独立的Excel文件
-        ts = datetime.now().strftime('%Y%m%d%H%M%S')
-        lease_file = Path(output_dir) / f'{ts}-lease.xlsx'
-        single_file = Path(output_dir) / f'{ts}-single.xlsx'
-        income_file = Path(output_dir) / f'{ts}-income.xlsx'
+            report.append(
+                f"  应收总额: {summary['应收总额']:.2f}\n"
+                f"  收入总额: {summary['收入总额']:.2f}\n"
+                f"  银行对账单: {summary['银行对账单']:.2f}\n"
+                f"  发票对账: {summary['发票对账']:.2f}")
+
+        if report:
+            sys.stdout.write('\n'.join(report) + '\n')
 
-        summary_df.to_excel(lease_file, index=False)
-        print(f"\n✓ 汇总数据已保存到: {lease_file}")
+        # 金额列此时是按合同分段的ndarray列表，一次拼成float64整列，
+        # DataFrame直接持有该数组，不再做逐元素推断
+        for cols in (recv_cols, income_cols):
+            for key, values in cols.items():
+                if values and isinstance(values[0], np.ndarray):
+                    cols[key] = np.concatenate(values)
 
-        monthly_receivables_df.to_excel(single_file, index=False)
-        print(f"✓ 应收月度明细已保存到: {single_file}")
+        # 汇总表数值列显式定型，跳过pandas逐列推断
+        for key in ('应收总额', '收入总额', '银行对账单', '发票对账'):
+            summary_cols[key] = np.asarray(summary_cols[key], dtype=np.float64)
 
-        monthly_income_df.to_excel(income_file, index=False)
-        print(f"✓ 收入月度明细已保存到: {income_file}")
+        # 转换为DataFrame（按列构造，零逐行拆解）
+        summary_df = pd.DataFrame(summary_cols)
+        monthly_receivables_df = pd.DataFrame(recv_cols)
+        monthly_income_df = pd.DataFrame(income_cols)
+
+        # 保存到三个独立的Excel文件
+        ts = datetime.now().strftime('%Y%m%d%H%M%S')
+        out_dir = Path(output_dir)
+        lease_file = out_dir / f'{ts}-lease.xlsx'
+        single_file = out_dir / f'{ts}-single.xlsx'
+        income_file = out_dir / f'{ts}-income.xlsx'
+
+        # 三个文件互不相关，zip压缩/写盘会释放GIL，并行写出
+        jobs = []
+        if output_format in ('xlsx', 'both'):
+            jobs += [
+                (_write_xlsx, summary_df, lease_file, '\n✓ 汇总数据已保存到'),
+                (_write_xlsx, monthly_receivables_df, single_file, '✓ 应收月度明细已保存到'),
+                (_write_xlsx, monthly_income_df, income_file, '✓ 收入月度明细已保存到'),
+            ]
+        if output_format in ('parquet', 'both'):
+            jobs += [
+                (_write_parquet, summary_df, out_dir / f'{ts}-lease.parquet',
+                 '\n✓ 汇总数据已保存到' if output_format == 'parquet' else '✓ 汇总数据已保存到'),
+                (_write_parquet, monthly_receivables_df, out_dir / f'{ts}-single.parquet',
+                 '✓ 应收月度明细已保存到'),
+                (_write_parquet, monthly_income_df, out_dir / f'{ts}-income.parquet',
+                 '✓ 收入月度明细已保存到'),
+            ]
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            futures = [ex.submit(writer, df, path) for writer, df, path, _ in jobs]
+            for future, (_, _, path, label) in zip(futures, jobs):
+                future.result()
+                print(f"{label}: {path}")
 
         # 保存日志
         if enable_log:
@@ -895,6 +1438,10 @@ def main():
     parser.add_argument('--log', help='日志文件路径（可选，如：log.txt）')
     parser.add_argument('--aux-columns', action='store_true',
                         help='在Excel输出中添加辅助列（中间值和计算公式），用于排错')
+    parser.add_argument('--format', default='xlsx',
+                        choices=['xlsx', 'parquet', 'both'], dest='output_format',
+                        help='输出格式：parquet写入更快、文件更小，适合程序消费'
+                             '（需要pyarrow）；默认xlsx')
 
     args = parser.parse_args()
 
@@ -907,7 +1454,8 @@ def main():
         args.end,
         args.output_dir,
         enable_log=(args.log is not None),
-        aux_columns=args.aux_columns
+        aux_columns=args.aux_columns,
+        output_format=args.output_format
     )
 
     # 显示汇总统计
@@ -8,10 +8,15 @@
 """
 import os
 from datetime import date
+from functools import lru_cache
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, numbers
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
+# 三个Sheet的前几列重复求列字母，做个小缓存
+_col_letter = lru_cache(maxsize=64)(get_column_letter)
+
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'public', 'template.xlsx')
 
 # Colors
@@ -19,44 +24,77 @@ BLUE = "DBEAFE"
 GRAY = "F5F5F5"
 INPUT_BG = "FFFFF0"
 
-def col_header(ws, col, row, value, width=None):
-    c = ws.cell(row=row, column=col)
-    c.value = value
-    c.font = Font(bold=True, size=9)
-    c.fill = PatternFill("solid", fgColor=BLUE)
-    c.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    if width:
-        ws.column_dimensions[get_column_letter(col)].width = width
-
-def col_desc(ws, col, row, value):
-    c = ws.cell(row=row, column=col)
-    c.value = value
-    c.font = Font(size=8, color="777777", italic=True)
-    c.fill = PatternFill("solid", fgColor=GRAY)
-    c.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-def data_cell(ws, col, row, value):
-    c = ws.cell(row=row, column=col)
-    c.value = value
-    c.font = Font(size=9)
-    c.fill = PatternFill("solid", fgColor=GRAY)
-    c.alignment = Alignment(horizontal="center", vertical="center")
-    thin = Side(style='thin', color='CCCCCC')
-    c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-def empty_cell(ws, col, row):
-    c = ws.cell(row=row, column=col)
-    c.fill = PatternFill("solid", fgColor=INPUT_BG)
-    thin = Side(style='thin', color='DDDDDD')
-    c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-def make_sheet1(wb):
-    ws = wb.active
-    ws.title = "合同原始数据"
+# 共享样式单例：openpyxl样式对象不可变，提到模块级一次创建，
+# 循环里只做引用赋值，免去逐格新建+去重的开销
+HEADER_FONT = Font(bold=True, size=9)
+HEADER_FILL = PatternFill("solid", fgColor=BLUE)
+DESC_FONT = Font(size=8, color="777777", italic=True)
+DATA_FONT = Font(size=9)
+GRAY_FILL = PatternFill("solid", fgColor=GRAY)
+INPUT_FILL = PatternFill("solid", fgColor=INPUT_BG)
+CENTER_WRAP = Alignment(horizontal="center", vertical="center", wrap_text=True)
+CENTER = Alignment(horizontal="center", vertical="center")
+_THIN_GRAY = Side(style='thin', color='CCCCCC')
+_THIN_LIGHT = Side(style='thin', color='DDDDDD')
+DATA_BORDER = Border(left=_THIN_GRAY, right=_THIN_GRAY,
+                     top=_THIN_GRAY, bottom=_THIN_GRAY)
+INPUT_BORDER = Border(left=_THIN_LIGHT, right=_THIN_LIGHT,
+                      top=_THIN_LIGHT, bottom=_THIN_LIGHT)
+
+def col_header(ws, value):
+    c = WriteOnlyCell(ws, value=value)
+    c.font = HEADER_FONT
+    c.fill = HEADER_FILL
+    c.alignment = CENTER_WRAP
+    return c
+
+def col_desc(ws, value):
+    c = WriteOnlyCell(ws, value=value)
+    c.font = DESC_FONT
+    c.fill = GRAY_FILL
+    c.alignment = CENTER_WRAP
+    return c
+
+def data_cell(ws, value, date_fmt=False):
+    c = WriteOnlyCell(ws, value=value)
+    c.font = DATA_FONT
+    c.fill = GRAY_FILL
+    c.alignment = CENTER
+    c.border = DATA_BORDER
+    if date_fmt and value is not None:
+        c.number_format = 'YYYY-MM-DD'
+    return c
+
+def empty_cell(ws):
+    c = WriteOnlyCell(ws)
+    c.fill = INPUT_FILL
+    c.border = INPUT_BORDER
+    return c
+
+def fill_sheet(ws, headers, examples, date_cols):
+    """按write-only模式的顺序要求：先设行高/列宽，再流式追加各行"""
     ws.row_dimensions[1].height = 30
-    ws.row_dimensions[2].height = 24
+    for row_num in range(2, 24):
+        ws.row_dimensions[row_num].height = 18
+    for i, (_, width) in enumerate(headers):
+        ws.column_dimensions[_col_letter(i + 1)].width = width
 
     # Row 1: 列名（计算器读取列名用）
+    ws.append([col_header(ws, h) for h, _ in headers])
+
+    # Row 2-3: 示例数据（可删除后填入自己的数据）
+    for row_data in examples:
+        ws.append([data_cell(ws, val, date_fmt=(i in date_cols))
+                   for i, val in enumerate(row_data)])
+
+    # Row 4-23: 空白填写区
+    n_cols = len(headers)
+    for _ in range(4, 24):
+        ws.append([empty_cell(ws) for _ in range(n_cols)])
+
+
+def make_sheet1(wb):
+    ws = wb.create_sheet("合同原始数据")
     headers = [
         ("客户名称", 20),
         ("商户编号", 12),
@@ -71,104 +109,36 @@ def make_sheet1(wb):
         ("保底租金第6年", 16),
         ("保底租金第7年", 16),
     ]
-    for i, (header, width) in enumerate(headers):
-        col_header(ws, i + 1, 1, header, width)
-
-    # Row 2-3: 示例数据（可删除后填入自己的数据）
     examples = [
         ["北京lbcy餐饮管理有限公司", "B1-01c", date(2025, 5, 12), date(2027, 5, 11), 30, 26496.00, 27820.80, None, None, None, None, None],
         ["上海XX贸易有限公司", "C2-03a", date(2024, 1, 1), date(2028, 12, 31), 60, 120000.00, 126000.00, 132300.00, 138915.00, None, None, None],
     ]
-    for r_offset, row_data in enumerate(examples):
-        row_num = 2 + r_offset
-        ws.row_dimensions[row_num].height = 18
-        for c_offset, val in enumerate(row_data):
-            c = ws.cell(row=row_num, column=c_offset + 1)
-            c.value = val
-            c.font = Font(size=9)
-            c.fill = PatternFill("solid", fgColor=GRAY)
-            c.alignment = Alignment(horizontal="center", vertical="center")
-            thin = Side(style='thin', color='CCCCCC')
-            c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            # Format date columns
-            if c_offset in (2, 3) and val is not None:
-                c.number_format = 'YYYY-MM-DD'
-
-    # Row 4-23: 空白填写区
-    for row_num in range(4, 24):
-        ws.row_dimensions[row_num].height = 18
-        for col_num in range(1, 13):
-            empty_cell(ws, col_num, row_num)
+    fill_sheet(ws, headers, examples, date_cols=(2, 3))
 
 
 def make_sheet2(wb):
     ws = wb.create_sheet("银行对账单")
-    ws.row_dimensions[1].height = 30
-    ws.row_dimensions[2].height = 24
-
     headers = [("交易时间", 22), ("贷方发生额（收入）", 20), ("对方户名", 25)]
-    for i, (h, w) in enumerate(headers):
-        col_header(ws, i + 1, 1, h, w)
-
     examples = [
         [date(2025, 8, 5), 26496.00, "北京lbcy餐饮管理有限公司"],
         [date(2025, 9, 3), 26496.00, "北京lbcy餐饮管理有限公司"],
     ]
-    for r_offset, row_data in enumerate(examples):
-        row_num = 2 + r_offset
-        ws.row_dimensions[row_num].height = 18
-        for c_offset, val in enumerate(row_data):
-            c = ws.cell(row=row_num, column=c_offset + 1)
-            c.value = val
-            c.font = Font(size=9)
-            c.fill = PatternFill("solid", fgColor=GRAY)
-            c.alignment = Alignment(horizontal="center", vertical="center")
-            thin = Side(style='thin', color='CCCCCC')
-            c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            if c_offset == 0 and val is not None:
-                c.number_format = 'YYYY-MM-DD'
-
-    for row_num in range(4, 24):
-        ws.row_dimensions[row_num].height = 18
-        for col_num in range(1, 4):
-            empty_cell(ws, col_num, row_num)
+    fill_sheet(ws, headers, examples, date_cols=(0,))
 
 
 def make_sheet3(wb):
     ws = wb.create_sheet("发票信息汇总表")
-    ws.row_dimensions[1].height = 30
-    ws.row_dimensions[2].height = 24
-
     headers = [("购买方名称", 25), ("开票日期", 18), ("价税合计", 22)]
-    for i, (h, w) in enumerate(headers):
-        col_header(ws, i + 1, 1, h, w)
-
     examples = [
         ["北京lbcy餐饮管理有限公司", date(2025, 8, 10), 29920.48],
         ["北京lbcy餐饮管理有限公司", date(2025, 9, 10), 29920.48],
     ]
-    for r_offset, row_data in enumerate(examples):
-        row_num = 2 + r_offset
-        ws.row_dimensions[row_num].height = 18
-        for c_offset, val in enumerate(row_data):
-            c = ws.cell(row=row_num, column=c_offset + 1)
-            c.value = val
-            c.font = Font(size=9)
-            c.fill = PatternFill("solid", fgColor=GRAY)
-            c.alignment = Alignment(horizontal="center", vertical="center")
-            thin = Side(style='thin', color='CCCCCC')
-            c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            if c_offset == 1 and val is not None:
-                c.number_format = 'YYYY-MM-DD'
-
-    for row_num in range(4, 24):
-        ws.row_dimensions[row_num].height = 18
-        for col_num in range(1, 4):
-            empty_cell(ws, col_num, row_num)
+    fill_sheet(ws, headers, examples, date_cols=(1,))
 
 
 def main():
-    wb = Workbook()
+    # write-only模式按行流式写盘，不在内存里建整棵单元格树
+    wb = Workbook(write_only=True)
     make_sheet1(wb)
     make_sheet2(wb)
     make_sheet3(wb)